@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""Benchmark inference and PPO updates on this machine and write a host profile for config.py.
+
+    python autotune.py                       # sweep, print tables, write MODEL_DIR/host_profile_<host>.json
+    python autotune.py --bots 200 --memory-limit 4096 --dry-run
+
+Everything runs on synthetic data with the configured network (HIDDEN_SIZES,
+MIXED_PRECISION, DEVICE). The sweep covers CPU thread counts for per-tick
+get_action and for ppo_update, and PPO minibatch sizes whose estimated
+memory fits the limit. STEPS_PER_BOT (and EPOCHS if needed) is then sized so
+the rollout fits in memory and one update stays within UPDATE_TIME_BUDGET.
+
+MINIBATCH_SIZE is an optimization setting, not just a speed knob: larger
+minibatches mean fewer gradient steps per update. The configured size is
+kept unless it does not fit the memory limit, or the update does not fit the
+time budget even at the smallest rollout; the sweep is printed for reference.
+"""
+
+import argparse
+import json
+import math
+import os
+import socket
+import time
+
+import numpy as np
+import torch
+
+import config
+from distill import benchmark as inference_ms
+from model import ActorCriticNetwork
+from ppo import RolloutBuffer, ppo_update
+
+MIN_STEPS_PER_BOT = 512
+
+
+def available_memory_mb() -> float:
+    """Currently available physical memory, falling back to the total."""
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return os.sysconf("SC_PHYS_PAGES") * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+def thread_candidates(max_threads: int) -> list[int]:
+    counts = [1 << i for i in range(max_threads.bit_length()) if 1 << i < max_threads]
+    return counts + [max_threads]
+
+
+def rollout_memory_mb(num_bots: int, steps_per_bot: int) -> float:
+    """Rollout buffer rows plus the sorted copy get_training_data makes."""
+    rows = num_bots * (steps_per_bot + 1)
+    stored = (config.OBS_SIZE + config.ACTION_SIZE + 4) * 4 + 8
+    training_copy = (config.OBS_SIZE + config.ACTION_SIZE + 5) * 4
+    return rows * (stored + training_copy) / 2**20
+
+
+def update_memory_mb(model: ActorCriticNetwork, minibatch_size: int) -> float:
+    """Weights, gradients and Adam moments plus one minibatch of activations and their gradients."""
+    params = sum(p.numel() for p in model.parameters())
+    activations = minibatch_size * (config.OBS_SIZE + 2 * sum(config.HIDDEN_SIZES)) * 2
+    return (params * 4 + activations) * 4 / 2**20
+
+
+def synthetic_buffer(model: ActorCriticNetwork, samples: int, num_bots: int) -> RolloutBuffer:
+    """A full rollout of random observations with the model's own actions and log-probs."""
+    buffer = RolloutBuffer(num_bots, max(1, samples // num_bots), config.OBS_SIZE)
+    n = buffer.capacity
+    obs = np.random.standard_normal((n, config.OBS_SIZE)).astype(np.float32)
+    with torch.no_grad():
+        actions, log_probs, values = model.get_action(torch.from_numpy(obs).to(config.DEVICE))
+    buffer.obs[:n] = obs
+    buffer.actions[:n] = actions.cpu().numpy()
+    buffer.log_probs[:n] = log_probs.cpu().numpy()
+    buffer.values[:n] = values.cpu().numpy()
+    buffer.rewards[:n] = np.random.standard_normal(n)
+    buffer.dones[:n] = np.random.random(n) < 0.01
+    buffer.slots[:n] = np.arange(n) % num_bots
+    return buffer
+
+
+def update_throughput(model, buffer: RolloutBuffer, minibatch_size: int) -> float:
+    """Samples per second for one ppo_update epoch over the buffer."""
+    # lr=0 keeps the weights (and so the KL early stop) out of the measurement
+    optimizer = torch.optim.Adam(model.parameters(), lr=0.0)
+    buffer.size = buffer.valid_count = buffer.capacity
+    start = time.perf_counter()
+    ppo_update(model, optimizer, buffer, epochs=1, minibatch_size=minibatch_size)
+    return buffer.capacity / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--bots", type=int, default=config.NUM_BOTS, help="Bots to size the rollout for")
+    parser.add_argument("--memory-limit", type=float, help="MB for rollout + update (default: half of available)")
+    parser.add_argument("--samples", type=int, default=4096, help="Synthetic samples per update benchmark")
+    parser.add_argument("--max-threads", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--out", default=config.HOST_PROFILE, help="Where to write the profile")
+    parser.add_argument("--dry-run", action="store_true", help="Print the tables and profile only")
+    args = parser.parse_args()
+
+    torch.manual_seed(0)
+    np.random.seed(0)
+    memory_limit = args.memory_limit or available_memory_mb() / 2
+    tick_batch = args.bots
+    if config.STAGGER_DECISIONS:
+        tick_batch = math.ceil(args.bots / config.DECISION_INTERVAL)
+    threads = thread_candidates(args.max_threads)
+    minibatches = [64 << i for i in range(int(math.log2(config.MAX_MINIBATCH_SIZE // 64)) + 1)]
+    minibatches = sorted(set(minibatches) | {config.PROFILE_DEFAULTS["MINIBATCH_SIZE"]})
+
+    model = ActorCriticNetwork().to(config.DEVICE)
+    buffer = synthetic_buffer(model, args.samples, min(args.bots, args.samples))
+    print(f"Host: {socket.gethostname()} ({os.cpu_count()} CPUs), device {config.DEVICE}, "
+          f"network {config.HIDDEN_SIZES}, mixed precision {'bf16' if config.MIXED_PRECISION else 'off'}")
+    print(f"Memory limit: {memory_limit:.0f} MB, {args.bots} bots, {tick_batch} deciding per tick\n")
+
+    print(f"{'threads':>7} {'get_action ms':>14} {'batch':>6}")
+    inference = {}
+    for n in threads:
+        torch.set_num_threads(n)
+        inference[n] = inference_ms(model, tick_batch, iters=100)
+        print(f"{n:>7} {inference[n]:>14.3f} {tick_batch:>6}")
+
+    print(f"\n{'threads':>7} {'minibatch':>9} {'samples/s':>10} {'memory MB':>10}")
+    throughput = {}
+    for n in threads:
+        torch.set_num_threads(n)
+        update_throughput(model, buffer, minibatches[0])  # warm-up
+        for mb in minibatches:
+            memory = update_memory_mb(model, mb)
+            if memory > memory_limit:
+                print(f"{n:>7} {mb:>9} {'over limit':>10} {memory:>10.0f}")
+                continue
+            throughput[n, mb] = update_throughput(model, buffer, mb)
+            print(f"{n:>7} {mb:>9} {throughput[n, mb]:>10.0f} {memory:>10.0f}")
+    if not throughput:
+        parser.error(f"no minibatch size fits in {memory_limit:.0f} MB")
+
+    inference_threads = min(inference, key=inference.get)
+    fitting = sorted({mb for _, mb in throughput})
+    minibatch_size = config.PROFILE_DEFAULTS["MINIBATCH_SIZE"]
+    if minibatch_size not in fitting:
+        # Over the memory limit: the largest smaller size that fits
+        minibatch_size = max([mb for mb in fitting if mb <= minibatch_size] or fitting[:1])
+    train_threads = max(threads, key=lambda n: throughput[n, minibatch_size])
+    samples_per_second = throughput[train_threads, minibatch_size]
+
+    epochs = config.PROFILE_DEFAULTS["EPOCHS"]
+    if args.bots * MIN_STEPS_PER_BOT / samples_per_second > config.UPDATE_TIME_BUDGET:
+        # Even one epoch over the smallest rollout is over budget: trade gradient steps for speed
+        train_threads, minibatch_size = max(throughput, key=throughput.get)
+        samples_per_second = throughput[train_threads, minibatch_size]
+        print(f"\nUpdate over budget at the configured minibatch size, using {minibatch_size}")
+
+    # Largest rollout that fits the memory limit and the update time budget
+    fixed_memory = update_memory_mb(model, minibatch_size)
+    steps_per_bot = config.PROFILE_DEFAULTS["STEPS_PER_BOT"]
+    while steps_per_bot > MIN_STEPS_PER_BOT and (
+        fixed_memory + rollout_memory_mb(args.bots, steps_per_bot) > memory_limit
+        or args.bots * steps_per_bot * epochs / samples_per_second > config.UPDATE_TIME_BUDGET
+    ):
+        steps_per_bot //= 2
+    epoch_seconds = args.bots * steps_per_bot / samples_per_second
+    epochs = max(1, min(epochs, int(config.UPDATE_TIME_BUDGET / epoch_seconds)))
+
+    settings = {
+        "TRAIN_THREADS": train_threads,
+        "INFERENCE_THREADS": inference_threads,
+        "MINIBATCH_SIZE": minibatch_size,
+        "EPOCHS": epochs,
+        "STEPS_PER_BOT": steps_per_bot,
+    }
+    print(f"\nProfile: {settings}")
+    print(f"Estimated update: {epoch_seconds * epochs:.1f}s, rollout memory "
+          f"{rollout_memory_mb(args.bots, steps_per_bot) + fixed_memory:.0f} MB")
+    if args.dry_run:
+        return
+
+    profile = {
+        "host": socket.gethostname(),
+        "cpu_count": os.cpu_count(),
+        "device": str(config.DEVICE),
+        "torch": torch.__version__,
+        "hidden_sizes": config.HIDDEN_SIZES,
+        "bots": args.bots,
+        "memory_limit_mb": round(memory_limit),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "settings": settings,
+    }
+    with open(args.out, "w") as f:
+        json.dump(profile, f, indent=2)
+    print(f"Profile written to {args.out} (loaded by config.py at startup)")
+
+
+if __name__ == "__main__":
+    main()
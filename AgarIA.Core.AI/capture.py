@@ -0,0 +1,53 @@
+"""Append-only capture of raw game API traffic for replay and benchmarking.
+
+Each record is a fixed header (kind, timestamp, payload length) followed by
+the zlib-compressed payload exactly as it went over the wire:
+
+    S  GET  /api/ai/state    response body
+    C  GET  /api/ai/config   response body
+    R  POST /api/ai/players  response body
+    A  POST /api/ai/actions  request body
+"""
+
+import struct
+import time
+import zlib
+from typing import Iterator
+
+STATE = b"S"
+CONFIG = b"C"
+REGISTER = b"R"
+ACTIONS = b"A"
+
+_HEADER = struct.Struct("<cdI")
+
+
+class CaptureWriter:
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "ab")
+
+    def write(self, kind: bytes, payload: bytes, timestamp: float | None = None):
+        data = zlib.compress(payload, 1)
+        self._file.write(_HEADER.pack(kind, timestamp or time.time(), len(data)))
+        self._file.write(data)
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def read_capture(path: str) -> Iterator[tuple[bytes, float, bytes]]:
+    """Yield (kind, timestamp, payload) records; a truncated tail record is ignored."""
+    with open(path, "rb") as f:
+        while True:
+            header = f.read(_HEADER.size)
+            if len(header) < _HEADER.size:
+                return
+            kind, timestamp, length = _HEADER.unpack(header)
+            data = f.read(length)
+            if len(data) < length:
+                return
+            yield kind, timestamp, zlib.decompress(data)
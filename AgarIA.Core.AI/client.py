@@ -1,49 +1,142 @@
 """REST client for the .NET game server AI API."""
 
+import functools
+import gzip
+import json
+import logging
+import time
+
 import requests
-from config import API_URL
+import capture
+from config import API_URL, API_COMPRESSION, CAPTURE_PATH
+from metrics import HTTP_REQUEST_SECONDS
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+_ACCEPT_ENCODING = {"none": "identity", "gzip": "gzip", "br": "br, gzip"}
+
+
+def _timed(method):
+    """Record the call's latency under its method name in the metrics endpoint.
+
+    Capture records queued during the call are compressed and written after
+    the timed region, so capture cost does not show up as request latency.
+    """
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        try:
+            with HTTP_REQUEST_SECONDS.time(method.__name__):
+                return method(self, *args, **kwargs)
+        finally:
+            self._write_captured()
+
+    return wrapper
 
 
 class GameClient:
-    def __init__(self, base_url: str = API_URL):
+    def __init__(
+        self,
+        base_url: str = API_URL,
+        capture_path: str | None = CAPTURE_PATH,
+        compression: str = API_COMPRESSION,
+    ):
         self.base_url = base_url.rstrip("/")
         self.session = requests.Session()
+        self.capture = capture.CaptureWriter(capture_path) if capture_path else None
+        self._captured: list[tuple[bytes, bytes, float]] = []
+
+        if compression not in _ACCEPT_ENCODING:
+            raise ValueError(f"Unknown API compression {compression!r}, expected none/gzip/br")
+        if compression == "br" and brotli is None:
+            logger.warning("brotli package not installed, falling back to gzip compression")
+            compression = "gzip"
+        self.compression = compression
+        self.session.headers["Accept-Encoding"] = _ACCEPT_ENCODING[compression]
+
+    def _capture(self, kind: bytes, payload: bytes):
+        if self.capture is not None:
+            self._captured.append((kind, payload, time.time()))
+
+    def _write_captured(self):
+        for kind, payload, timestamp in self._captured:
+            self.capture.write(kind, payload, timestamp)
+        self._captured.clear()
 
+    def flush_capture(self):
+        if self.capture is not None:
+            self.capture.flush()
+
+    def close(self):
+        if self.capture is not None:
+            self.capture.close()
+            self.capture = None
+
+    @_timed
     def get_state(self) -> dict:
         resp = self.session.get(f"{self.base_url}/api/ai/state")
         resp.raise_for_status()
+        self._capture(capture.STATE, resp.content)
         return resp.json()
 
+    @_timed
     def get_config(self) -> dict:
         resp = self.session.get(f"{self.base_url}/api/ai/config")
         resp.raise_for_status()
+        self._capture(capture.CONFIG, resp.content)
         return resp.json()
 
+    @_timed
     def register_bots(self, count: int) -> list[str]:
         resp = self.session.post(
             f"{self.base_url}/api/ai/players",
             json={"count": count},
         )
         resp.raise_for_status()
+        self._capture(capture.REGISTER, resp.content)
         return resp.json()["playerIds"]
 
+    @_timed
     def remove_bots(self):
         resp = self.session.delete(f"{self.base_url}/api/ai/players")
         resp.raise_for_status()
 
+    def _encode_body(self, body: bytes) -> tuple[bytes, dict]:
+        """Compress a JSON request body according to the configured encoding."""
+        headers = {"Content-Type": "application/json"}
+        if self.compression == "br":
+            headers["Content-Encoding"] = "br"
+            return brotli.compress(body, quality=1), headers
+        if self.compression == "gzip":
+            headers["Content-Encoding"] = "gzip"
+            return gzip.compress(body, compresslevel=1), headers
+        return body, headers
+
+    @_timed
     def post_actions(self, actions: list[dict]):
+        body = json.dumps({"actions": actions}, separators=(",", ":")).encode("utf-8")
+        self._capture(capture.ACTIONS, body)
+        data, headers = self._encode_body(body)
         resp = self.session.post(
             f"{self.base_url}/api/ai/actions",
-            json={"actions": actions},
+            data=data,
+            headers=headers,
         )
         resp.raise_for_status()
         return resp.json()
 
+    @_timed
     def get_training_mode(self) -> bool:
         resp = self.session.get(f"{self.base_url}/api/ai/training")
         resp.raise_for_status()
         return resp.json()["enabled"]
 
+    @_timed
     def post_stats(self, stats: dict):
         resp = self.session.post(
             f"{self.base_url}/api/ai/stats",
@@ -1,9 +1,9 @@
 """Configuration for the Python AI sidecar."""
 
+import json
 import logging
 import os
-
-import torch
+import socket
 
 logger = logging.getLogger(__name__)
 
@@ -11,16 +11,36 @@ logger = logging.getLogger(__name__)
 # .NET Game Server
 API_URL = os.environ.get("API_URL", "http://localhost:5000")
 
+# HTTP payload compression for /api/ai: "none", "gzip" or "br" (needs the brotli package).
+# Off by default: request bodies are sent compressed without negotiation, so
+# only enable it against a server with AiApi:Compression on, across a real network
+API_COMPRESSION = os.environ.get("API_COMPRESSION", "none")
+
+# Append raw state payloads and posted actions to this file for replay.py (unset disables)
+CAPTURE_PATH = os.environ.get("CAPTURE_PATH") or None
+
+# Prometheus metrics endpoint (opt-in: port 0 disables; 9100 is node_exporter's)
+METRICS_HOST = os.environ.get("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "0"))
+
 # Bot management
-NUM_BOTS = 1
+NUM_BOTS = int(os.environ.get("NUM_BOTS", "1"))
+
+# League play: comma-separated checkpoints of frozen policies that each control
+# an interleaved share of the bots; only the learner's bots are trained on
+LEAGUE_POLICIES = [p for p in os.environ.get("LEAGUE_POLICIES", "").split(",") if p]
 
 # Model persistence
 MODEL_DIR = os.environ.get("MODEL_DIR", ".")
 MODEL_PATH = os.path.join(MODEL_DIR, "ppo_model.pt")
+# Weights + normalizers only, memory-mapped at startup so bots act before the optimizer loads
+WEIGHTS_PATH = os.path.join(MODEL_DIR, "ppo_weights.pt")
 
 
-def _select_device() -> torch.device:
+def _select_device() -> "torch.device":
     """Select best available device: CUDA > MPS > CPU."""
+    import torch
+
     if torch.cuda.is_available():
         dev = torch.device("cuda")
         name = torch.cuda.get_device_name(0)
@@ -33,10 +53,24 @@ def _select_device() -> torch.device:
     return torch.device("cpu")
 
 
-DEVICE = _select_device()
+def __getattr__(name: str):
+    # Probing CUDA/MPS imports torch and initializes drivers, so defer it to first use
+    if name == "DEVICE":
+        global DEVICE
+        DEVICE = _select_device()
+        return DEVICE
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 # Network architecture
-HIDDEN_SIZES = [512, 512, 512]
+HIDDEN_SIZES = [int(h) for h in os.environ.get("HIDDEN_SIZES", "512,512,512").split(",")]
+# Default student architecture for distill.py
+STUDENT_HIDDEN_SIZES = [128, 128]
+
+# Mixed precision: autocast the shared trunk to bfloat16 (opt-in, pays off on
+# CPUs with AVX-512 BF16/AMX and on recent GPUs). Heads, log-probs, losses and
+# normalizers stay in fp32.
+MIXED_PRECISION = os.environ.get("MIXED_PRECISION", "0") == "1"
 
 # PPO hyperparameters
 LEARNING_RATE = 3e-4
@@ -49,6 +83,13 @@ MAX_GRAD_NORM = 0.5
 STEPS_PER_BOT = 8192
 MINIBATCH_SIZE = 128
 EPOCHS = 4
+TARGET_KL = 0.02  # stop the update once approx KL exceeds 1.5x this (None disables)
+
+# Adaptive update schedule: tune epochs/minibatch size from measured KL and update time
+ADAPTIVE_SCHEDULE = os.environ.get("ADAPTIVE_SCHEDULE", "0") == "1"
+MAX_EPOCHS = 10
+MAX_MINIBATCH_SIZE = 1024
+UPDATE_TIME_BUDGET = 30.0  # seconds per PPO update
 
 # Observation
 OBS_SIZE = 821  # 7 self + 2 prev action + 512 food (256 * 2) + 300 players (50 * 6)
@@ -56,4 +97,43 @@ ACTION_SIZE = 2  # relative direction (-1 to 1)
 
 # Training loop
 TICK_INTERVAL = 0.05  # seconds between state polls (20 TPS)
+# Each bot picks a new action every DECISION_INTERVAL ticks; rewards accumulate
+# in between and GAE discounts per decision (GAMMA/LAMBDA ** interval)
+DECISION_INTERVAL = int(os.environ.get("DECISION_INTERVAL", "1"))
+if DECISION_INTERVAL < 1:
+    raise ValueError(f"DECISION_INTERVAL must be at least 1, got {DECISION_INTERVAL}")
+# Spread bots across the interval so each tick runs inference for ~1/k of them
+STAGGER_DECISIONS = os.environ.get("STAGGER_DECISIONS", "1") == "1"
 SAVE_INTERVAL = 60  # seconds between model saves
+
+# CPU threads for the PPO update and for per-tick inference (0 = torch default)
+TRAIN_THREADS = 0
+INFERENCE_THREADS = 0
+
+# Host profile written by autotune.py; its settings override the defaults above
+HOST_PROFILE = os.environ.get(
+    "HOST_PROFILE", os.path.join(MODEL_DIR, f"host_profile_{socket.gethostname()}.json")
+)
+PROFILE_SETTINGS = ("TRAIN_THREADS", "INFERENCE_THREADS", "MINIBATCH_SIZE", "EPOCHS", "STEPS_PER_BOT")
+# Built-in values, so autotune.py sweeps from them rather than from an older profile
+PROFILE_DEFAULTS = {k: globals()[k] for k in PROFILE_SETTINGS}
+
+
+def _load_host_profile(path: str):
+    if not path or not os.path.exists(path):
+        return
+    try:
+        with open(path) as f:
+            settings = json.load(f)["settings"]
+        applied = {k: int(v) for k, v in settings.items() if k in PROFILE_SETTINGS}
+        invalid = [k for k, v in applied.items() if v < 1]
+        if invalid:
+            raise ValueError(f"{', '.join(invalid)} must be at least 1")
+    except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+        logger.warning(f"Ignoring host profile {path}: {e}")
+        return
+    globals().update(applied)
+    logger.info(f"Loaded host profile {path}: {applied}")
+
+
+_load_host_profile(HOST_PROFILE)
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""Distill a trained policy into a smaller student network for inference-only deployments.
+
+    python distill.py --teacher ppo_model.pt --data capture.bin --out student.pt
+    python distill.py --teacher ppo_model.pt --synthetic 200000 --hidden 128,128
+
+The student copies the teacher's observation normalizer and log-std and is
+trained to match its action mean and value. The output uses the weights-file
+layout, so it can be deployed as MODEL_DIR/ppo_weights.pt with HIDDEN_SIZES
+set to the student's sizes, or loaded through LEAGUE_POLICIES.
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+
+import config
+from features import build_observations
+from model import ActorCriticNetwork
+from normalizer import RunningNormalizer
+
+
+def load_teacher(path: str) -> tuple[ActorCriticNetwork, RunningNormalizer]:
+    checkpoint = torch.load(path, map_location=config.DEVICE, mmap=True, weights_only=False)
+    teacher = ActorCriticNetwork(hidden_sizes=checkpoint.get("hidden_sizes")).to(config.DEVICE)
+    teacher.load_state_dict(checkpoint["model"])
+    teacher.eval()
+    obs_normalizer = RunningNormalizer(config.OBS_SIZE)
+    if "obs_normalizer" in checkpoint:
+        obs_normalizer.load_state_dict(checkpoint["obs_normalizer"])
+    return teacher, obs_normalizer
+
+
+def teacher_targets(teacher: ActorCriticNetwork, obs: np.ndarray, batch_size: int = 4096):
+    """Teacher action means and values for normalized observations."""
+    means, values = [], []
+    with torch.no_grad():
+        for start in range(0, len(obs), batch_size):
+            policy, value = teacher(torch.from_numpy(obs[start:start + batch_size]).to(config.DEVICE))
+            means.append(torch.tanh(policy).cpu())
+            values.append(value.squeeze(-1).cpu())
+    return torch.cat(means), torch.cat(values)
+
+
+def recorded_observations(
+    path: str, teacher: ActorCriticNetwork, obs_normalizer: RunningNormalizer
+) -> np.ndarray:
+    """Normalized observations for every acted-for bot in a capture file.
+
+    Previous-action features are filled with the teacher's own action means.
+    """
+    from replay import load_capture
+
+    states, acted_ids, _, _ = load_capture(path)
+    batches = []
+    prev_actions = None
+    for payload, bot_ids in zip(states, acted_ids):
+        if not bot_ids:
+            continue
+        if prev_actions is None or prev_actions.shape[0] != len(bot_ids):
+            prev_actions = np.zeros((len(bot_ids), config.ACTION_SIZE), dtype=np.float32)
+        obs = obs_normalizer.normalize(build_observations(json.loads(payload), bot_ids, prev_actions))
+        prev_actions = teacher_targets(teacher, obs)[0].numpy()
+        batches.append(obs)
+    return np.concatenate(batches) if batches else np.zeros((0, config.OBS_SIZE), dtype=np.float32)
+
+
+def synthetic_observations(count: int, obs_normalizer: RunningNormalizer) -> np.ndarray:
+    """Observations sampled in normalized space, i.e. from the teacher's running statistics."""
+    obs = np.random.standard_normal((count, config.OBS_SIZE)).astype(np.float32)
+    return np.clip(obs, -obs_normalizer.clip, obs_normalizer.clip)
+
+
+def evaluate(student, obs, target_means, target_values) -> dict:
+    """Action-mean error, direction agreement and value error against the teacher."""
+    means, values = teacher_targets(student, obs)
+    cosine = F.cosine_similarity(means, target_means, dim=-1, eps=1e-6)
+    return {
+        "action_mae": (means - target_means).abs().mean().item(),
+        "direction_cos": cosine.mean().item(),
+        "value_mae": (values - target_values).abs().mean().item(),
+    }
+
+
+def benchmark(model: ActorCriticNetwork, batch: int, iters: int = 200) -> float:
+    """Mean get_action latency in milliseconds for a batch of bots."""
+    obs = torch.randn(batch, config.OBS_SIZE, device=config.DEVICE)
+    with torch.no_grad():
+        for _ in range(10):
+            model.get_action(obs)
+        start = time.perf_counter()
+        for _ in range(iters):
+            model.get_action(obs)
+    return (time.perf_counter() - start) / iters * 1000.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--teacher", default=config.MODEL_PATH, help="Trained checkpoint")
+    parser.add_argument("--data", help="Capture file with recorded states (see replay.py)")
+    parser.add_argument("--synthetic", type=int, default=0, help="Add this many sampled observations")
+    parser.add_argument("--hidden", default=",".join(map(str, config.STUDENT_HIDDEN_SIZES)),
+                        help="Student hidden sizes, comma-separated")
+    parser.add_argument("--epochs", type=int, default=20)
+    parser.add_argument("--batch-size", type=int, default=512)
+    parser.add_argument("--lr", type=float, default=1e-3)
+    parser.add_argument("--value-coeff", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="student.pt", help="Where to write the student")
+    args = parser.parse_args()
+
+    torch.manual_seed(args.seed)
+    np.random.seed(args.seed)
+    teacher, obs_normalizer = load_teacher(args.teacher)
+
+    datasets = []
+    if args.data:
+        datasets.append(recorded_observations(args.data, teacher, obs_normalizer))
+    if args.synthetic:
+        datasets.append(synthetic_observations(args.synthetic, obs_normalizer))
+    if sum(len(d) for d in datasets) < 2:
+        parser.error("need at least 2 observations (one to train on, one to validate): pass --data and/or --synthetic")
+    obs = np.concatenate(datasets)
+    target_means, target_values = teacher_targets(teacher, obs)
+
+    # Hold out 10% to measure how closely the student tracks the teacher
+    order = np.random.permutation(len(obs))
+    n_val = max(1, len(obs) // 10)
+    val_idx, train_idx = order[:n_val], order[n_val:]
+    train_obs = torch.from_numpy(obs[train_idx]).to(config.DEVICE)
+    train_means = target_means[train_idx].to(config.DEVICE)
+    train_values = target_values[train_idx].to(config.DEVICE)
+
+    hidden_sizes = [int(h) for h in args.hidden.split(",")]
+    student = ActorCriticNetwork(hidden_sizes=hidden_sizes).to(config.DEVICE)
+    with torch.no_grad():
+        student.log_std.copy_(teacher.log_std)
+    student.log_std.requires_grad_(False)
+    optimizer = torch.optim.Adam(
+        [p for p in student.parameters() if p.requires_grad], lr=args.lr
+    )
+
+    teacher_params = sum(p.numel() for p in teacher.parameters())
+    student_params = sum(p.numel() for p in student.parameters())
+    print(f"Teacher: {teacher_params:,} params, student {hidden_sizes}: {student_params:,} params")
+    print(f"Distilling on {len(train_idx):,} observations, validating on {n_val:,}")
+
+    n = len(train_idx)
+    for epoch in range(args.epochs):
+        student.train()
+        permutation = torch.randperm(n, device=config.DEVICE)
+        total = 0.0
+        for start in range(0, n, args.batch_size):
+            idx = permutation[start:start + args.batch_size]
+            policy, value = student(train_obs[idx])
+            loss = F.mse_loss(torch.tanh(policy), train_means[idx]) + args.value_coeff * F.mse_loss(
+                value.squeeze(-1), train_values[idx]
+            )
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+            total += loss.item() * len(idx)
+        student.eval()
+        val = evaluate(student, obs[val_idx], target_means[val_idx], target_values[val_idx])
+        print(
+            f"[Epoch {epoch + 1}] loss={total / n:.5f} action_mae={val['action_mae']:.4f} "
+            f"direction_cos={val['direction_cos']:.4f} value_mae={val['value_mae']:.4f}"
+        )
+
+    torch.save(
+        {
+            "model": student.state_dict(),
+            "obs_normalizer": obs_normalizer.state_dict(),
+            "total_steps": 0,
+            "hidden_sizes": hidden_sizes,
+        },
+        args.out,
+    )
+    print(f"Student saved to {args.out} (deploy with HIDDEN_SIZES={args.hidden})")
+
+    print(f"{'batch':>6} {'teacher ms':>11} {'student ms':>11} {'speedup':>8}")
+    for batch in (1, 50, 200):
+        t_ms = benchmark(teacher, batch)
+        s_ms = benchmark(student, batch)
+        print(f"{batch:>6} {t_ms:>11.3f} {s_ms:>11.3f} {t_ms / s_ms:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
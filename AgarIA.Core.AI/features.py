@@ -9,23 +9,28 @@ TOP_PLAYER_K = 50
 
 
 def build_observations(
-    state: dict, bot_ids: list[str], prev_actions: np.ndarray = None
+    state: dict,
+    bot_ids: list[str],
+    prev_actions: np.ndarray = None,
+    bots: list[dict | None] = None,
 ) -> np.ndarray:
     """Build observation vectors for all bots from raw game state.
 
     Args:
         prev_actions: (num_bots, 2) previous actions [targetX, targetY], or None for zeros.
+        bots: Player dict (or None) per bot, e.g. BotRegistry.players, to skip the id lookup.
 
     Returns: (num_bots, OBS_SIZE) float32 array.
     """
-    players_by_id = {p["id"]: p for p in state["players"]}
+    if bots is None:
+        players_by_id = {p["id"]: p for p in state["players"]}
+        bots = [players_by_id.get(bot_id) for bot_id in bot_ids]
     food_list = state["food"]
     map_size = state["mapSize"]
 
     obs = np.zeros((len(bot_ids), OBS_SIZE), dtype=np.float32)
 
-    for i, bot_id in enumerate(bot_ids):
-        bot = players_by_id.get(bot_id)
+    for i, bot in enumerate(bots):
         if bot is None or not bot["isAlive"]:
             continue
         obs[i] = _build_single(bot, food_list, state["players"], map_size, prev_actions[i] if prev_actions is not None else None)
@@ -135,31 +140,14 @@ def _build_single(
 
 
 def compute_rewards(
-    prev_state: dict | None,
-    curr_state: dict,
-    bot_ids: list[str],
-    prev_masses: dict[str, float],
+    masses: np.ndarray,
+    prev_masses: np.ndarray,
+    alive: np.ndarray,
     start_mass: float,
-) -> tuple[np.ndarray, dict[str, float]]:
-    """Compute per-bot rewards from consecutive states.
+) -> tuple[np.ndarray, np.ndarray]:
+    """Compute per-bot rewards from mass deltas; a dead bot loses its previous mass.
 
-    Returns: (rewards array, updated masses dict)
+    Returns: (rewards array, updated previous masses)
     """
-    rewards = np.zeros(len(bot_ids), dtype=np.float32)
-    players_by_id = {p["id"]: p for p in curr_state["players"]}
-    new_masses = {}
-
-    for i, bot_id in enumerate(bot_ids):
-        player = players_by_id.get(bot_id)
-        if player is None or not player["isAlive"]:
-            prev_mass = prev_masses.get(bot_id, start_mass)
-            rewards[i] = -prev_mass / start_mass
-            new_masses[bot_id] = start_mass
-            continue
-
-        curr_mass = player["mass"]
-        prev_mass = prev_masses.get(bot_id, start_mass)
-        rewards[i] = (curr_mass - prev_mass) / start_mass
-        new_masses[bot_id] = curr_mass
-
-    return rewards, new_masses
+    rewards = np.where(alive, masses - prev_masses, -prev_masses) / start_mass
+    return rewards.astype(np.float32), np.where(alive, masses, start_mass)
@@ -0,0 +1,96 @@
+"""Frozen policy snapshots that control bot groups next to the learning policy (league play)."""
+
+import os
+
+import numpy as np
+import torch
+
+import config
+from model import ActorCriticNetwork
+from normalizer import RunningNormalizer
+
+
+class PolicySnapshot:
+    """Inference-only copy of a saved policy with its own observation normalizer."""
+
+    def __init__(self, path: str):
+        self.name = os.path.splitext(os.path.basename(path))[0]
+        checkpoint = torch.load(path, map_location=config.DEVICE, mmap=True, weights_only=False)
+        # Distilled students record their own (smaller) architecture
+        self.model = ActorCriticNetwork(hidden_sizes=checkpoint.get("hidden_sizes")).to(config.DEVICE)
+        self.obs_normalizer = RunningNormalizer(config.OBS_SIZE)
+        self.model.load_state_dict(checkpoint["model"])
+        if "obs_normalizer" in checkpoint:
+            self.obs_normalizer.load_state_dict(checkpoint["obs_normalizer"])
+        self.model.eval()
+        self.model.requires_grad_(False)
+
+
+class League:
+    """Assigns bot slots to policies and runs each frozen group through its own network.
+
+    Policy 0 is the learner; slot i belongs to policy i % num_policies so
+    groups stay interleaved and stable when dead bots are replaced in place.
+    With no snapshots every slot belongs to the learner.
+    """
+
+    def __init__(self, snapshot_paths: list[str], num_bots: int):
+        self.snapshots = [PolicySnapshot(p) for p in snapshot_paths]
+        self.names = ["learner"] + [s.name for s in self.snapshots]
+        num_policies = len(self.names)
+        self.groups = np.arange(num_bots) % num_policies
+        self.group_slots = [np.flatnonzero(self.groups == g) for g in range(num_policies)]
+        self.learner_slots = self.group_slots[0]
+        # Global slot -> index among the learner's slots (-1 for frozen groups)
+        self.learner_index = np.full(num_bots, -1, dtype=np.int64)
+        self.learner_index[self.learner_slots] = np.arange(len(self.learner_slots))
+        self._reset_stats()
+
+    def _reset_stats(self):
+        num_policies = len(self.names)
+        self.mass_sum = np.zeros(num_policies, dtype=np.float64)
+        self.alive_ticks = np.zeros(num_policies, dtype=np.int64)
+        self.deaths = np.zeros(num_policies, dtype=np.int64)
+        self.leads = np.zeros(num_policies, dtype=np.int64)
+        self.ticks = 0
+
+    def act(self, raw_obs: np.ndarray, actions: np.ndarray, row_groups: np.ndarray):
+        """Fill the frozen groups' rows of actions in place from their own policies.
+
+        row_groups holds the policy index of each row (self.groups[slots]).
+        """
+        for g, snapshot in enumerate(self.snapshots, start=1):
+            rows = np.flatnonzero(row_groups == g)
+            if len(rows) == 0:
+                continue
+            obs = snapshot.obs_normalizer.normalize(raw_obs[rows])
+            with torch.no_grad():
+                group_actions, _, _ = snapshot.model.get_action(
+                    torch.from_numpy(obs).to(config.DEVICE)
+                )
+            actions[rows] = group_actions.cpu().numpy()
+
+    def record_deaths(self, slots: list[int]):
+        self.deaths += np.bincount(self.groups[slots], minlength=len(self.names))
+
+    def record(self, masses: np.ndarray, alive_mask: np.ndarray):
+        """Accumulate per-policy mass and who holds the heaviest bot this tick."""
+        alive = alive_mask > 0
+        self.mass_sum += np.bincount(self.groups, weights=masses * alive, minlength=len(self.names))
+        self.alive_ticks += np.bincount(self.groups[alive], minlength=len(self.names))
+        if alive.any():
+            self.leads[self.groups[np.argmax(np.where(alive, masses, -np.inf))]] += 1
+        self.ticks += 1
+
+    def report(self) -> list[str]:
+        """Per-policy summary since the last report; resets the counters."""
+        lines = []
+        for g, name in enumerate(self.names):
+            avg_mass = self.mass_sum[g] / max(self.alive_ticks[g], 1)
+            lead_share = self.leads[g] / max(self.ticks, 1)
+            lines.append(
+                f"[League] {name}: bots={len(self.group_slots[g])} avg_mass={avg_mass:.1f} "
+                f"deaths={self.deaths[g]} lead={lead_share:.1%}"
+            )
+        self._reset_stats()
+        return lines
@@ -0,0 +1,198 @@
+"""Prometheus text-format metrics served from a background HTTP thread."""
+
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_REGISTRY: list = []
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+DURATION_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+def _format_labels(label: str | None, value: str | None, extra: str = "") -> str:
+    parts = []
+    if label is not None:
+        parts.append(f'{label}="{value}"')
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    """Monotonically increasing value; use rate() in PromQL for per-second figures."""
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self.value = 0.0
+        self._lock = threading.Lock()
+        _REGISTRY.append(self)
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+    def render(self) -> list[str]:
+        return [
+            f"# HELP {self.name} {self.help}",
+            f"# TYPE {self.name} counter",
+            f"{self.name} {self.value}",
+        ]
+
+
+class Gauge:
+    """Point-in-time value, either set explicitly or read from a callback at scrape time."""
+
+    def __init__(self, name: str, help_text: str, fn=None):
+        self.name = name
+        self.help = help_text
+        self.value = 0.0
+        self.fn = fn
+        _REGISTRY.append(self)
+
+    def set(self, value: float):
+        self.value = float(value)
+
+    def render(self) -> list[str]:
+        value = self.fn() if self.fn is not None else self.value
+        return [
+            f"# HELP {self.name} {self.help}",
+            f"# TYPE {self.name} gauge",
+            f"{self.name} {value}",
+        ]
+
+
+class Histogram:
+    """Cumulative-bucket histogram with an optional single label dimension."""
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        buckets: tuple = LATENCY_BUCKETS,
+        label: str | None = None,
+    ):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self.label = label
+        self._series: dict[str | None, list] = {}
+        self._lock = threading.Lock()
+        _REGISTRY.append(self)
+
+    def observe(self, value: float, label_value: str | None = None):
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                # [bucket counts..., +Inf count, sum]
+                series = [0] * (len(self.buckets) + 1) + [0.0]
+                self._series[label_value] = series
+            series[bisect.bisect_left(self.buckets, value)] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, label_value: str | None = None):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, label_value)
+
+    def render(self) -> list[str]:
+        lines = [
+            f"# HELP {self.name} {self.help}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self._lock:
+            series = {k: list(v) for k, v in self._series.items()}
+        for label_value, counts in sorted(series.items(), key=lambda kv: kv[0] or ""):
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = _format_labels(self.label, label_value, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            cumulative += counts[len(self.buckets)]
+            le = _format_labels(self.label, label_value, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{le} {cumulative}")
+            labels = _format_labels(self.label, label_value)
+            lines.append(f"{self.name}_sum{labels} {counts[-1]}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+def _read_rss() -> float:
+    """Current resident set size in bytes (peak RSS where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return float(int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE"))
+    except (OSError, ValueError, IndexError):
+        import resource
+        import sys
+
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return float(rss if sys.platform == "darwin" else rss * 1024)
+
+
+TICK_SECONDS = Histogram(
+    "agaria_ai_tick_seconds", "Wall time of one sidecar loop iteration."
+)
+INFERENCE_SECONDS = Histogram(
+    "agaria_ai_inference_seconds", "Batched get_action latency per tick."
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "agaria_ai_http_request_seconds",
+    "Game server API latency per GameClient method.",
+    label="method",
+)
+PPO_UPDATE_SECONDS = Histogram(
+    "agaria_ai_ppo_update_seconds", "Wall time of one PPO update.", DURATION_BUCKETS
+)
+CHECKPOINT_SECONDS = Histogram(
+    "agaria_ai_checkpoint_seconds", "Wall time of one checkpoint save.", DURATION_BUCKETS
+)
+STEPS = Counter("agaria_ai_steps_total", "Alive-bot transitions collected.")
+PPO_UPDATES = Counter("agaria_ai_ppo_updates_total", "PPO updates completed.")
+BUFFER_FILL = Gauge("agaria_ai_buffer_fill_ratio", "Rollout buffer fill level (0-1).")
+ALIVE_BOTS = Gauge("agaria_ai_alive_bots", "Bots alive in the latest state.")
+STARTUP_SECONDS = Gauge(
+    "agaria_ai_time_to_first_action_seconds", "Process start until the first posted actions."
+)
+RSS_BYTES = Gauge(
+    "agaria_ai_process_resident_memory_bytes", "Resident memory of the sidecar.", _read_rss
+)
+
+
+def render() -> str:
+    lines = []
+    for metric in _REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(host: str, port: int) -> ThreadingHTTPServer:
+    """Serve /metrics on a daemon thread so scrapes never block the training loop."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name="metrics", daemon=True)
+    thread.start()
+    return server
@@ -2,13 +2,19 @@
 
 import torch
 import torch.nn as nn
-from config import OBS_SIZE, ACTION_SIZE, HIDDEN_SIZES, DEVICE
+from config import OBS_SIZE, ACTION_SIZE, HIDDEN_SIZES, MIXED_PRECISION
 
 
 class ActorCriticNetwork(nn.Module):
-    def __init__(self, obs_size: int = OBS_SIZE, hidden_sizes: list[int] = None):
+    def __init__(
+        self,
+        obs_size: int = OBS_SIZE,
+        hidden_sizes: list[int] = None,
+        mixed_precision: bool = MIXED_PRECISION,
+    ):
         super().__init__()
         hidden_sizes = hidden_sizes or HIDDEN_SIZES
+        self.mixed_precision = mixed_precision
 
         # Shared hidden layers
         layers = []
@@ -41,8 +47,18 @@ class ActorCriticNetwork(nn.Module):
         nn.init.zeros_(self.value_head.bias)
 
     def forward(self, obs: torch.Tensor) -> tuple[torch.Tensor, torch.Tensor]:
-        """Returns (policy_output [B, 2], value [B, 1])."""
-        hidden = self.shared(obs)
+        """Returns (policy_output [B, 2], value [B, 1]).
+
+        With mixed precision enabled only the shared trunk runs under bf16
+        autocast; the heads and everything downstream stay in fp32.
+        """
+        with torch.autocast(
+            device_type=obs.device.type,
+            dtype=torch.bfloat16,
+            enabled=self.mixed_precision,
+        ):
+            hidden = self.shared(obs)
+        hidden = hidden.float()
         policy = self.policy_head(hidden)
         value = self.value_head(hidden)
         return policy, value
@@ -71,7 +71,7 @@ class RewardNormalizer:
         return np.clip(rewards / std, -10.0, 10.0).astype(np.float32)
 
     def state_dict(self) -> dict:
-        return {"mean": self.mean, "var": self.var, "count": self.count}
+        return {"mean": float(self.mean), "var": float(self.var), "count": float(self.count)}
 
     def load_state_dict(self, d: dict):
         self.mean = d["mean"]
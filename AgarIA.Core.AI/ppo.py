@@ -12,122 +12,268 @@ from config import (
     MAX_GRAD_NORM,
     MINIBATCH_SIZE,
     EPOCHS,
-    DEVICE,
+    TARGET_KL,
+    MAX_EPOCHS,
+    MAX_MINIBATCH_SIZE,
+    UPDATE_TIME_BUDGET,
 )
 from model import ActorCriticNetwork
 
 
 class RolloutBuffer:
-    """Stores trajectory data for PPO training, structured per-bot."""
+    """Packed storage of alive-bot transitions, trained on as per-bot trajectories.
 
-    def __init__(self, num_bots: int, steps_per_bot: int, obs_size: int):
+    Only bots that acted get a row, so dead slots cost nothing. Rows are
+    appended in arrival order tagged with their bot slot; a row's reward and
+    done flag arrive at the bot's next decision (or death) through
+    complete(). Readiness counts completed rows, and each bot's still-pending
+    row supplies the bootstrap value V(s_T) for its trajectory. A trajectory
+    cut by discard_pending() ends at its last completed row, which is marked
+    truncated and bootstraps from the dropped row's value.
+    """
+
+    def __init__(
+        self, num_bots: int, steps_per_bot: int, obs_size: int, decision_interval: int = 1
+    ):
         self.num_bots = num_bots
         self.steps_per_bot = steps_per_bot
-        self.obs = np.zeros((num_bots, steps_per_bot, obs_size), dtype=np.float32)
-        self.actions = np.zeros((num_bots, steps_per_bot, config.ACTION_SIZE), dtype=np.float32)
-        self.log_probs = np.zeros((num_bots, steps_per_bot), dtype=np.float32)
-        self.rewards = np.zeros((num_bots, steps_per_bot), dtype=np.float32)
-        self.values = np.zeros((num_bots, steps_per_bot), dtype=np.float32)
-        self.dones = np.zeros((num_bots, steps_per_bot), dtype=np.float32)
-        self.step_count = 0
+        # A transition spans decision_interval ticks, so discount per decision
+        self.gamma = GAMMA ** decision_interval
+        self.lam = LAMBDA ** decision_interval
+        self.capacity = num_bots * steps_per_bot
+        # complete() can take valid_count up to capacity - 1 + num_bots before the
+        # ready() check, and the following add() needs one more row per bot
+        rows = self.capacity + 2 * num_bots
+        self.obs = np.zeros((rows, obs_size), dtype=np.float32)
+        self.actions = np.zeros((rows, config.ACTION_SIZE), dtype=np.float32)
+        self.log_probs = np.zeros(rows, dtype=np.float32)
+        self.rewards = np.zeros(rows, dtype=np.float32)
+        self.values = np.zeros(rows, dtype=np.float32)
+        self.dones = np.zeros(rows, dtype=np.float32)
+        self.slots = np.zeros(rows, dtype=np.int64)
+        self.truncated = np.zeros(rows, dtype=bool)
+        self.next_values = np.zeros(rows, dtype=np.float32)
+        self.pending = np.full(num_bots, -1, dtype=np.int64)
+        self.size = 0
+        self.valid_count = 0
+        self.ticks = 0
+
+    def complete(self, rewards: np.ndarray, dones: np.ndarray, mask: np.ndarray | None = None):
+        """Attach (num_bots,) rewards and dones to each bot's pending row, optionally only where mask is set."""
+        closing = self.pending >= 0
+        if mask is not None:
+            closing &= mask
+        slots = np.flatnonzero(closing)
+        rows = self.pending[slots]
+        self.rewards[rows] = rewards[slots]
+        self.dones[rows] = dones[slots]
+        self.pending[slots] = -1
+        self.valid_count += len(slots)
 
     def add(
         self,
+        slots: np.ndarray,
         obs: np.ndarray,
         actions: np.ndarray,
         log_probs: np.ndarray,
-        rewards: np.ndarray,
         values: np.ndarray,
-        dones: np.ndarray,
     ):
-        """Add one tick of transitions. Each arg is (num_bots,) or (num_bots, dim)."""
-        if self.step_count >= self.steps_per_bot:
+        """Append one tick of transitions for the given bot slots (alive bots only)."""
+        self.ticks += 1
+        n = len(slots)
+        if n == 0:
             return
-        t = self.step_count
-        self.obs[:, t] = obs
-        self.actions[:, t] = actions
-        self.log_probs[:, t] = log_probs
-        self.rewards[:, t] = rewards
-        self.values[:, t] = values
-        self.dones[:, t] = dones
-        self.step_count += 1
+        if self.size + n > len(self.obs):
+            # Only reachable when a ready buffer was not trained on (e.g. the update failed)
+            self._grow(self.size + n - len(self.obs))
+        rows = np.arange(self.size, self.size + n)
+        self.obs[rows] = obs
+        self.actions[rows] = actions
+        self.log_probs[rows] = log_probs
+        self.values[rows] = values
+        self.rewards[rows] = 0.0
+        self.dones[rows] = 0.0
+        self.slots[rows] = slots
+        self.truncated[rows] = False
+        self.pending[slots] = rows
+        self.size += n
+
+    def discard_pending(self):
+        """Drop every pending row, e.g. when trajectories are cut without a real terminal state."""
+        slots = np.flatnonzero(self.pending >= 0)
+        if len(slots) == 0:
+            return
+        dropped = self.pending[slots]
+        keep = np.ones(self.size, dtype=bool)
+        keep[dropped] = False
+
+        # End each cut slot's trajectory at its last completed row, bootstrapping
+        # from the dropped row, so it never chains into the slot's next bot
+        last_row = np.full(self.num_bots, -1, dtype=np.int64)
+        kept_rows = np.flatnonzero(keep)
+        np.maximum.at(last_row, self.slots[kept_rows], kept_rows)
+        cut = last_row[slots] >= 0
+        self.truncated[last_row[slots[cut]]] = True
+        self.next_values[last_row[slots[cut]]] = self.values[dropped[cut]]
+
+        k = int(keep.sum())
+        for arr in self._arrays():
+            arr[:k] = arr[:self.size][keep]
+        self.pending[slots] = -1
+        self.size = k
+
+    def _arrays(self) -> tuple[np.ndarray, ...]:
+        return (
+            self.obs, self.actions, self.log_probs, self.rewards, self.values,
+            self.dones, self.slots, self.truncated, self.next_values,
+        )
+
+    def _grow(self, extra: int):
+        (
+            self.obs, self.actions, self.log_probs, self.rewards, self.values,
+            self.dones, self.slots, self.truncated, self.next_values,
+        ) = (
+            np.concatenate([arr, np.zeros((extra,) + arr.shape[1:], dtype=arr.dtype)])
+            for arr in self._arrays()
+        )
 
     def ready(self) -> bool:
-        return self.step_count >= self.steps_per_bot
+        return self.valid_count >= self.capacity
+
+    def fill_ratio(self) -> float:
+        return self.valid_count / self.capacity
 
     def reset(self):
-        self.step_count = 0
-
-    def get_training_data(self, last_values: np.ndarray) -> dict:
-        """Compute GAE per bot, then flatten for minibatch sampling.
-
-        Args:
-            last_values: Bootstrap values V(s_T) for each bot, shape (num_bots,).
-        """
-        T = self.step_count
-        all_advantages = np.zeros((self.num_bots, T), dtype=np.float32)
-        all_returns = np.zeros((self.num_bots, T), dtype=np.float32)
-
-        for b in range(self.num_bots):
-            rewards = self.rewards[b, :T]
-            values = self.values[b, :T]
-            dones = self.dones[b, :T]
-
-            advantages = np.zeros(T, dtype=np.float32)
-            last_gae = 0.0
-            for t in reversed(range(T)):
-                if t == T - 1:
-                    next_value = last_values[b]
-                else:
-                    next_value = values[t + 1]
-                next_non_terminal = 1.0 - dones[t]
-                delta = rewards[t] + GAMMA * next_value * next_non_terminal - values[t]
-                advantages[t] = last_gae = delta + GAMMA * LAMBDA * next_non_terminal * last_gae
-
-            all_advantages[b] = advantages
-            all_returns[b] = advantages + values
-
-        # Flatten (num_bots, T, ...) -> (num_bots * T, ...)
-        n = self.num_bots * T
+        """Drop completed rows, carrying pending rows over to the next rollout."""
+        slots = np.flatnonzero(self.pending >= 0)
+        rows = self.pending[slots]
+        k = len(rows)
+        for arr in (self.obs, self.actions, self.log_probs, self.values, self.slots):
+            arr[:k] = arr[rows]
+        self.truncated[:k] = False
+        self.pending[slots] = np.arange(k)
+        self.size = k
+        self.valid_count = 0
+        self.ticks = 0
+
+    def get_training_data(self) -> dict:
+        """Compute GAE over completed rows packed into per-bot trajectories."""
+        n = self.size
+        completed = np.ones(n, dtype=bool)
+        pending_slots = np.flatnonzero(self.pending >= 0)
+        completed[self.pending[pending_slots]] = False
+
+        # Stable sort by slot keeps each bot's rows in time order
+        order = np.argsort(self.slots[:n], kind="stable")
+        order = order[completed[order]]
+        slots = self.slots[order]
+        rewards = self.rewards[order]
+        values = self.values[order]
+        dones = self.dones[order]
+        truncated = self.truncated[order]
+        m = len(order)
+
+        # Next-state value: the following row of the same bot, the bot's
+        # pending row at the end of its trajectory (zero if it has none), or
+        # the dropped row's value where discard_pending() cut the trajectory
+        bootstrap = np.zeros(self.num_bots, dtype=np.float32)
+        bootstrap[pending_slots] = self.values[self.pending[pending_slots]]
+        trajectory_end = np.ones(m, dtype=bool)
+        trajectory_end[:-1] = slots[:-1] != slots[1:]
+        next_values = np.empty(m, dtype=np.float32)
+        next_values[:-1] = values[1:]
+        next_values[trajectory_end] = bootstrap[slots[trajectory_end]]
+        next_values[truncated] = self.next_values[order][truncated]
+        trajectory_end |= truncated
+        next_non_terminal = 1.0 - dones
+
+        advantages = np.zeros(m, dtype=np.float32)
+        last_gae = 0.0
+        for t in reversed(range(m)):
+            if trajectory_end[t]:
+                last_gae = 0.0
+            delta = rewards[t] + self.gamma * next_values[t] * next_non_terminal[t] - values[t]
+            advantages[t] = last_gae = delta + self.gamma * self.lam * next_non_terminal[t] * last_gae
+
         return {
-            "obs": self.obs[:, :T].reshape(n, -1),
-            "actions": self.actions[:, :T].reshape(n, -1),
-            "log_probs": self.log_probs[:, :T].reshape(n),
-            "values": self.values[:, :T].reshape(n),
-            "advantages": all_advantages.reshape(n),
-            "returns": all_returns.reshape(n),
+            "obs": self.obs[order],
+            "actions": self.actions[order],
+            "log_probs": self.log_probs[order],
+            "values": values,
+            "advantages": advantages,
+            "returns": advantages + values,
         }
 
 
+class UpdateSchedule:
+    """Adapts PPO epochs and minibatch size from the last update's KL and duration.
+
+    Epochs shrink to what was actually run when the KL early stop fires and grow
+    again while the policy barely moves. The minibatch size doubles when an
+    update overruns UPDATE_TIME_BUDGET and halves back once there is headroom.
+    """
+
+    def __init__(self, epochs: int = EPOCHS, minibatch_size: int = MINIBATCH_SIZE):
+        self.epochs = epochs
+        self.minibatch_size = minibatch_size
+
+    def step(self, stats: dict, duration: float):
+        if stats["early_stopped"]:
+            self.epochs = max(1, int(np.ceil(stats["epochs"])))
+        elif (
+            TARGET_KL is not None
+            and stats["approx_kl"] < TARGET_KL / 2
+            and duration < UPDATE_TIME_BUDGET
+        ):
+            self.epochs = min(self.epochs + 1, MAX_EPOCHS)
+
+        if duration > UPDATE_TIME_BUDGET:
+            self.minibatch_size = min(self.minibatch_size * 2, MAX_MINIBATCH_SIZE)
+        elif duration < UPDATE_TIME_BUDGET / 4 and self.minibatch_size > MINIBATCH_SIZE:
+            self.minibatch_size = max(self.minibatch_size // 2, MINIBATCH_SIZE)
+
+
 def ppo_update(
     model: ActorCriticNetwork,
     optimizer: torch.optim.Optimizer,
     buffer: RolloutBuffer,
-    last_values: np.ndarray,
+    epochs: int = EPOCHS,
+    minibatch_size: int = MINIBATCH_SIZE,
 ) -> dict:
-    """Run PPO update epochs on the buffer. Returns training stats."""
-    data = buffer.get_training_data(last_values)
+    """Run PPO update epochs on the buffer. Returns training stats.
 
-    obs_t = torch.from_numpy(data["obs"]).to(DEVICE)
-    actions_t = torch.from_numpy(data["actions"]).to(DEVICE)
-    old_log_probs_t = torch.from_numpy(data["log_probs"]).to(DEVICE)
-    old_values_t = torch.from_numpy(data["values"]).to(DEVICE)
-    advantages_t = torch.from_numpy(data["advantages"]).to(DEVICE)
-    returns_t = torch.from_numpy(data["returns"]).to(DEVICE)
+    Stops early once the approximate KL to the behaviour policy exceeds
+    1.5 * TARGET_KL, so later minibatches are not spent on clipped updates.
+    """
+    data = buffer.get_training_data()
+    device = config.DEVICE
+
+    obs_t = torch.from_numpy(data["obs"]).to(device)
+    actions_t = torch.from_numpy(data["actions"]).to(device)
+    old_log_probs_t = torch.from_numpy(data["log_probs"]).to(device)
+    old_values_t = torch.from_numpy(data["values"]).to(device)
+    advantages_t = torch.from_numpy(data["advantages"]).to(device)
+    returns_t = torch.from_numpy(data["returns"]).to(device)
 
     total_loss = 0.0
     total_policy_loss = 0.0
     total_value_loss = 0.0
     total_entropy = 0.0
+    total_approx_kl = 0.0
+    total_clip_fraction = 0.0
     num_updates = 0
+    num_measured = 0
+    early_stopped = False
+    stop_kl = 0.0
 
+    # The packed buffer holds an arbitrary number of rows; spreading the
+    # remainder over the minibatches avoids a tiny trailing one whose
+    # advantages normalize to ~0
     n = obs_t.shape[0]
-    for _ in range(EPOCHS):
-        indices = np.random.permutation(n)
-        for start in range(0, n, MINIBATCH_SIZE):
-            end = min(start + MINIBATCH_SIZE, n)
-            idx = indices[start:end]
-            idx_t = torch.from_numpy(idx).long().to(DEVICE)
+    minibatches_per_epoch = max(1, n // minibatch_size)
+    for _ in range(epochs):
+        for idx in np.array_split(np.random.permutation(n), minibatches_per_epoch):
+            idx_t = torch.from_numpy(idx).long().to(device)
 
             mb_obs = obs_t[idx_t]
             mb_actions = actions_t[idx_t]
@@ -136,15 +282,31 @@ def ppo_update(
             mb_advantages = advantages_t[idx_t]
             mb_returns = returns_t[idx_t]
 
-            # Normalize advantages per minibatch
+            # Normalize advantages per minibatch (population std stays finite
+            # for a buffer with a single row)
             mb_advantages = (mb_advantages - mb_advantages.mean()) / (
-                mb_advantages.std() + 1e-8
+                mb_advantages.std(unbiased=False) + 1e-8
             )
 
             log_probs, values, entropy = model.evaluate_actions(mb_obs, mb_actions)
 
             # Clipped surrogate loss
-            ratio = torch.exp(log_probs - mb_old_log_probs)
+            log_ratio = log_probs - mb_old_log_probs
+            ratio = torch.exp(log_ratio)
+
+            # Approximate KL (k3 estimator) and share of clipped ratios
+            with torch.no_grad():
+                approx_kl = ((ratio - 1.0) - log_ratio).mean().item()
+                clip_fraction = ((ratio - 1.0).abs() > CLIP_EPSILON).float().mean().item()
+            # The minibatch that triggers the stop still counts toward the reported KL
+            total_approx_kl += approx_kl
+            total_clip_fraction += clip_fraction
+            num_measured += 1
+            if TARGET_KL is not None and approx_kl > 1.5 * TARGET_KL:
+                early_stopped = True
+                stop_kl = approx_kl
+                break
+
             surr1 = ratio * mb_advantages
             surr2 = torch.clamp(ratio, 1.0 - CLIP_EPSILON, 1.0 + CLIP_EPSILON) * mb_advantages
             policy_loss = -torch.min(surr1, surr2).mean()
@@ -171,6 +333,8 @@ def ppo_update(
             total_value_loss += value_loss.item()
             total_entropy += entropy.mean().item()
             num_updates += 1
+        if early_stopped:
+            break
 
     buffer.reset()
 
@@ -179,4 +343,9 @@ def ppo_update(
         "policy_loss": total_policy_loss / max(num_updates, 1),
         "value_loss": total_value_loss / max(num_updates, 1),
         "entropy": total_entropy / max(num_updates, 1),
+        "approx_kl": total_approx_kl / max(num_measured, 1),
+        "clip_fraction": total_clip_fraction / max(num_measured, 1),
+        "epochs": num_updates / minibatches_per_epoch,
+        "early_stopped": early_stopped,
+        "stop_kl": stop_kl,
     }
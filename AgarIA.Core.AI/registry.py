@@ -0,0 +1,84 @@
+"""Fixed bot slots with per-slot NumPy state, refreshed from the game state once per tick."""
+
+import numpy as np
+
+import config
+
+
+class BotRegistry:
+    """Maps the sidecar's bots to stable slot indices.
+
+    A slot keeps its index when its bot dies and is replaced, so per-slot
+    arrays (and everything indexed by slot, like the rollout buffer and
+    league groups) stay aligned. refresh() makes the only pass over the
+    state's player list each tick.
+    """
+
+    def __init__(self, bot_ids: list[str], start_mass: float):
+        self.start_mass = start_mass
+        n = len(bot_ids)
+        self.ids: list[str] = []
+        self.slot_of: dict[str, int] = {}
+        self.players: list[dict | None] = [None] * n
+        self.alive = np.zeros(n, dtype=bool)
+        self.mass = np.zeros(n, dtype=np.float64)
+        self.prev_mass = np.full(n, start_mass, dtype=np.float64)
+        self.x = np.zeros(n, dtype=np.float64)
+        self.y = np.zeros(n, dtype=np.float64)
+        self.prev_actions = np.zeros((n, config.ACTION_SIZE), dtype=np.float32)
+        # Reward accumulated since each slot's last decision
+        self.reward_sum = np.zeros(n, dtype=np.float32)
+        self.reset(bot_ids)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def reset(self, bot_ids: list[str]):
+        """Assign a fresh bot to every slot (after a game reset)."""
+        self.ids = list(bot_ids)
+        self.slot_of = {bid: i for i, bid in enumerate(self.ids)}
+        self.prev_mass[:] = self.start_mass
+        self.prev_actions[:] = 0.0
+        self.reward_sum[:] = 0.0
+        self.alive[:] = False
+
+    def replace(self, slots: np.ndarray, new_ids: list[str]):
+        """Put newly registered bots into the given (dead) slots.
+
+        reward_sum is kept: it still belongs to the dead bot's open transition,
+        which the caller closes (and clears) this tick.
+        """
+        for slot, bid in zip(slots, new_ids):
+            self.slot_of.pop(self.ids[slot], None)
+            self.ids[slot] = bid
+            self.slot_of[bid] = slot
+        self.prev_mass[slots] = self.start_mass
+        self.prev_actions[slots] = 0.0
+
+    def refresh(self, state: dict):
+        """Fill per-slot arrays from one pass over the state's players."""
+        self.players = [None] * len(self.ids)
+        self.alive[:] = False
+        self.mass[:] = 0.0
+        slot_of = self.slot_of
+        for p in state["players"]:
+            slot = slot_of.get(p["id"])
+            if slot is None:
+                continue
+            self.players[slot] = p
+            if p["isAlive"]:
+                self.alive[slot] = True
+                self.mass[slot] = p["mass"]
+                self.x[slot] = p["x"]
+                self.y[slot] = p["y"]
+
+    def due(self, tick_index: int, interval: int, stagger: bool) -> np.ndarray:
+        """Slots that pick a new action this tick; staggered slots are offset by their index."""
+        phase = np.arange(len(self.ids)) if stagger else 0
+        return (tick_index - phase) % interval == 0
+
+    def action_targets(self, actions: np.ndarray, map_size: float) -> tuple[np.ndarray, np.ndarray]:
+        """Absolute move targets: relative offset scaled by 200, clamped to the map."""
+        target_x = np.clip(self.x + actions[:, 0] * 200.0, 0.0, map_size)
+        target_y = np.clip(self.y + actions[:, 1] * 200.0, 0.0, map_size)
+        return target_x, target_y
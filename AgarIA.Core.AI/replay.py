@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""Replay captured game traffic (see capture.py) for deterministic performance runs.
+
+    python replay.py capture.bin               # push every tick through the inference path
+    python replay.py capture.bin --serve 5000  # stand-in /api/ai server for train.py
+"""
+
+import argparse
+import gzip
+import itertools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+import capture
+import config
+
+
+def load_capture(path: str) -> tuple[list[bytes], list[list[str]], bytes | None, list[str]]:
+    """Split a capture into states, the bot ids acted for after each state, config and registered ids."""
+    states: list[bytes] = []
+    acted_ids: list[list[str]] = []
+    game_config = None
+    registered: list[str] = []
+
+    for kind, _, payload in capture.read_capture(path):
+        if kind == capture.STATE:
+            states.append(payload)
+            acted_ids.append(acted_ids[-1] if acted_ids else [])
+        elif kind == capture.ACTIONS and acted_ids:
+            acted_ids[-1] = [a["playerId"] for a in json.loads(payload)["actions"]]
+        elif kind == capture.CONFIG:
+            game_config = payload
+        elif kind == capture.REGISTER:
+            registered.extend(json.loads(payload)["playerIds"])
+
+    return states, acted_ids, game_config, registered
+
+
+def _summary(name: str, samples: list[float]) -> str:
+    ms = np.array(samples) * 1000.0
+    return (
+        f"{name:<14} {ms.mean():>9.3f} {np.percentile(ms, 50):>9.3f} "
+        f"{np.percentile(ms, 99):>9.3f} {ms.max():>9.3f}"
+    )
+
+
+def benchmark(path: str, model_path: str | None, seed: int, limit: int | None):
+    import torch
+    from features import build_observations
+    from model import ActorCriticNetwork
+    from normalizer import RunningNormalizer, RewardNormalizer
+    from train import load_checkpoint
+
+    states, acted_ids, _, _ = load_capture(path)
+    if limit:
+        states, acted_ids = states[:limit], acted_ids[:limit]
+    if not states:
+        print(f"No state records in {path}")
+        return
+
+    torch.manual_seed(seed)
+    np.random.seed(seed)
+    model = ActorCriticNetwork().to(config.DEVICE)
+    obs_normalizer = RunningNormalizer(config.OBS_SIZE)
+    load_checkpoint(model, obs_normalizer, RewardNormalizer(), model_path)
+    model.eval()
+
+    timings = {"parse": [], "features": [], "normalize": [], "inference": [], "total": []}
+    prev_actions = None
+    total_bots = 0
+    run_start = time.perf_counter()
+
+    for payload, bot_ids in zip(states, acted_ids):
+        if not bot_ids:
+            continue
+        t0 = time.perf_counter()
+        state = json.loads(payload)
+        t1 = time.perf_counter()
+        if prev_actions is None or prev_actions.shape[0] != len(bot_ids):
+            prev_actions = np.zeros((len(bot_ids), config.ACTION_SIZE), dtype=np.float32)
+        raw_obs = build_observations(state, bot_ids, prev_actions)
+        t2 = time.perf_counter()
+        obs = obs_normalizer.normalize(raw_obs)
+        t3 = time.perf_counter()
+        with torch.no_grad():
+            actions, _, _ = model.get_action(torch.from_numpy(obs).to(config.DEVICE))
+        prev_actions = actions.cpu().numpy()
+        t4 = time.perf_counter()
+
+        timings["parse"].append(t1 - t0)
+        timings["features"].append(t2 - t1)
+        timings["normalize"].append(t3 - t2)
+        timings["inference"].append(t4 - t3)
+        timings["total"].append(t4 - t0)
+        total_bots += len(bot_ids)
+
+    elapsed = time.perf_counter() - run_start
+    ticks = len(timings["total"])
+    if ticks == 0:
+        print(f"No ticks with posted actions in {path}")
+        return
+    print(f"Replayed {ticks} ticks ({total_bots / ticks:.1f} bots/tick avg) from {path}")
+    print(f"{'stage':<14} {'mean ms':>9} {'p50 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for name, samples in timings.items():
+        print(_summary(name, samples))
+    print(f"Throughput: {ticks / elapsed:.1f} ticks/s, {total_bots / elapsed:.0f} bot-steps/s")
+
+
+def serve(path: str, host: str, port: int):
+    """Answer the sidecar's /api/ai calls from the capture, advancing one state per GET."""
+    states, _, game_config, registered = load_capture(path)
+    if not states or game_config is None:
+        print(f"{path} needs at least one state and one config record to serve")
+        return
+
+    lock = threading.Lock()
+    state_iter = itertools.cycle(states)
+    id_iter = itertools.cycle(registered) if registered else None
+    counter = itertools.count()
+
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, body: bytes, status: int = 200):
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _read_json(self) -> dict:
+            length = int(self.headers.get("Content-Length", 0))
+            body = self.rfile.read(length)
+            encoding = self.headers.get("Content-Encoding")
+            if encoding == "gzip":
+                body = gzip.decompress(body)
+            elif encoding == "br":
+                import brotli
+
+                body = brotli.decompress(body)
+            return json.loads(body or b"{}")
+
+        def do_GET(self):
+            if self.path == "/api/ai/state":
+                with lock:
+                    body = next(state_iter)
+                self._send(body)
+            elif self.path == "/api/ai/config":
+                self._send(game_config)
+            elif self.path == "/api/ai/training":
+                self._send(b'{"enabled":true}')
+            else:
+                self.send_error(404)
+
+        def do_POST(self):
+            request = self._read_json()
+            if self.path == "/api/ai/players":
+                with lock:
+                    if id_iter is not None:
+                        ids = [next(id_iter) for _ in range(request["count"])]
+                    else:
+                        ids = [f"replay_{next(counter)}" for _ in range(request["count"])]
+                self._send(json.dumps({"playerIds": ids}).encode("utf-8"))
+            elif self.path == "/api/ai/actions":
+                self._send(json.dumps({"applied": len(request.get("actions", []))}).encode("utf-8"))
+            elif self.path in ("/api/ai/stats", "/api/ai/training"):
+                self._send(b"{}")
+            else:
+                self.send_error(404)
+
+        def do_DELETE(self):
+            if self.path == "/api/ai/players":
+                self._send(b'{"message":"All external AI bots removed"}')
+            else:
+                self.send_error(404)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    print(f"Serving {len(states)} captured states on http://{host}:{port}/api/ai")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("capture", help="Capture file written with CAPTURE_PATH")
+    parser.add_argument("--model", help="Checkpoint to load (default: MODEL_DIR weights)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for action sampling")
+    parser.add_argument("--limit", type=int, help="Replay at most this many states")
+    parser.add_argument("--serve", type=int, metavar="PORT", help="Serve the capture as /api/ai instead")
+    parser.add_argument("--host", default="127.0.0.1", help="Bind address for --serve")
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.capture, args.host, args.serve)
+    else:
+        benchmark(args.capture, args.model, args.seed, args.limit)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,9 @@ import signal
 import sys
 import os
 
+# Taken before the heavy imports so time-to-first-action covers the whole startup
+_START_TIME = time.perf_counter()
+
 import torch
 import numpy as np
 
@@ -16,21 +19,32 @@ logging.basicConfig(
 )
 
 import config
+import metrics
 from client import GameClient
 from features import build_observations, compute_rewards
+from registry import BotRegistry
 from model import ActorCriticNetwork
 from normalizer import RunningNormalizer, RewardNormalizer
-from ppo import RolloutBuffer, ppo_update
+from ppo import RolloutBuffer, UpdateSchedule, ppo_update
+from league import League
 from config import STEPS_PER_BOT
 
 
 def main():
-    print(f"Device: {config.DEVICE}")
     print(f"API URL: {config.API_URL}")
     print(f"Bots: {config.NUM_BOTS}")
     print(f"Network: {config.OBS_SIZE} -> {config.HIDDEN_SIZES} -> {config.ACTION_SIZE}")
+    print(f"Mixed precision: {'bf16' if config.MIXED_PRECISION else 'off'}")
     print()
 
+    if config.METRICS_PORT:
+        try:
+            metrics.start_server(config.METRICS_HOST, config.METRICS_PORT)
+            print(f"Metrics: http://{config.METRICS_HOST}:{config.METRICS_PORT}/metrics")
+        except OSError as e:
+            print(f"WARNING: Metrics endpoint disabled, cannot bind "
+                  f"{config.METRICS_HOST}:{config.METRICS_PORT}: {e}")
+
     client = GameClient()
 
     # Get game config
@@ -43,6 +57,14 @@ def main():
         print(f"Make sure the .NET server is running at {config.API_URL}")
         sys.exit(1)
 
+    print(f"Device: {config.DEVICE}")
+
+    # Small per-tick inference batches and the PPO update scale differently with threads
+    inference_threads = config.INFERENCE_THREADS or torch.get_num_threads()
+    train_threads = config.TRAIN_THREADS or torch.get_num_threads()
+    torch.set_num_threads(inference_threads)
+    print(f"Threads: inference={inference_threads}, train={train_threads}")
+
     # Initialize model
     model = ActorCriticNetwork().to(config.DEVICE)
     optimizer = torch.optim.Adam(model.parameters(), lr=config.LEARNING_RATE)
@@ -55,27 +77,20 @@ def main():
     num_bots = len(bot_ids)
     print(f"Registered {num_bots} bots")
 
-    buffer = RolloutBuffer(num_bots, STEPS_PER_BOT, config.OBS_SIZE)
+    league = League(config.LEAGUE_POLICIES, num_bots)
+    learner = league.learner_slots
+    if league.snapshots:
+        print(f"League: {', '.join(league.names)} ({len(learner)} learner bots)")
 
-    # Load saved model if exists
-    if os.path.exists(config.MODEL_PATH):
-        try:
-            checkpoint = torch.load(config.MODEL_PATH, map_location=config.DEVICE, weights_only=False)
-            model.load_state_dict(checkpoint["model"])
-            optimizer.load_state_dict(checkpoint["optimizer"])
-            if "obs_normalizer" in checkpoint:
-                obs_normalizer.load_state_dict(checkpoint["obs_normalizer"])
-            if "reward_normalizer" in checkpoint:
-                reward_normalizer.load_state_dict(checkpoint["reward_normalizer"])
-            total_steps = checkpoint.get("total_steps", 0)
-            print(f"Loaded model from {config.MODEL_PATH} (step {total_steps})")
-        except Exception as e:
-            print(f"WARNING: Failed to load checkpoint: {e}")
-            print(f"Delete {config.MODEL_PATH} if architecture changed. Starting fresh.")
-            total_steps = 0
-    else:
-        total_steps = 0
-        print("Starting with fresh model")
+    # Only the learner's bots feed the rollout buffer
+    buffer = RolloutBuffer(
+        len(learner), STEPS_PER_BOT, config.OBS_SIZE, decision_interval=config.DECISION_INTERVAL
+    )
+    schedule = UpdateSchedule()
+
+    # Load weights and normalizers first so bots can act right away; the
+    # optimizer state is only needed by the first PPO update
+    total_steps, optimizer_pending = load_checkpoint(model, obs_normalizer, reward_normalizer)
 
     # Graceful shutdown
     running = True
@@ -88,13 +103,14 @@ def main():
     signal.signal(signal.SIGINT, on_signal)
     signal.signal(signal.SIGTERM, on_signal)
 
-    prev_masses: dict[str, float] = {bid: start_mass for bid in bot_ids}
-    prev_actions = np.zeros((num_bots, config.ACTION_SIZE), dtype=np.float32)
+    registry = BotRegistry(bot_ids, start_mass)
     prev_tick = 0
+    loop_tick = 0
     last_save = time.time()
     train_count = 0
     training_enabled = True
     last_training_mode = True
+    first_action_pending = True
 
     print("Training loop started\n")
 
@@ -108,6 +124,11 @@ def main():
                 if training_enabled != last_training_mode:
                     print(f"{'Training' if training_enabled else 'Inference-only'} mode")
                     last_training_mode = training_enabled
+                    if not training_enabled:
+                        # No rewards are collected while paused; drop the open transitions
+                        # rather than recording a fake terminal state
+                        buffer.discard_pending()
+                        registry.reward_sum[:] = 0.0
             except Exception:
                 pass
 
@@ -119,10 +140,11 @@ def main():
             if current_tick < prev_tick:
                 print(f"Game reset detected (tick {prev_tick} -> {current_tick}), re-registering...")
                 try:
+                    # Every bot is replaced; their last actions have no outcome to record
+                    buffer.discard_pending()
                     client.remove_bots()
                     bot_ids = client.register_bots(num_bots)
-                    prev_masses = {bid: start_mass for bid in bot_ids}
-                    prev_actions = np.zeros((num_bots, config.ACTION_SIZE), dtype=np.float32)
+                    registry.reset(bot_ids)
                     print(f"Re-registered after reset: {bot_ids}")
                 except Exception as e:
                     print(f"Re-registration after reset failed: {e}")
@@ -130,132 +152,170 @@ def main():
                 continue
             prev_tick = current_tick
 
-            # Check if bots are alive, re-register dead ones
-            players_by_id = {p["id"]: p for p in state["players"]}
-            alive_bots = [bid for bid in bot_ids if bid in players_by_id and players_by_id[bid]["isAlive"]]
+            # Check if bots are alive, re-register dead ones into their slots
+            registry.refresh(state)
+            died = np.zeros(num_bots, dtype=bool)
+            death_rewards = np.zeros(num_bots, dtype=np.float32)
+            dead_slots = np.flatnonzero(~registry.alive)
 
-            if len(alive_bots) < num_bots:
-                dead_count = len(bot_ids) - len(alive_bots)
-                if dead_count > 0:
-                    try:
-                        print(f"Re-registering {dead_count} dead bots (killed in game)...")
-                        new_ids = client.register_bots(dead_count)
-                        print(f"Re-registered: {new_ids}")
-                        # Replace dead bot IDs
-                        new_bot_ids = []
-                        new_idx = 0
-                        for bid in bot_ids:
-                            if bid in players_by_id and players_by_id[bid]["isAlive"]:
-                                new_bot_ids.append(bid)
-                            elif new_idx < len(new_ids):
-                                new_bot_ids.append(new_ids[new_idx])
-                                prev_masses[new_ids[new_idx]] = start_mass
-                                new_idx += 1
-                        bot_ids = new_bot_ids
-                        # Refresh state and recompute lookups
-                        state = client.get_state()
-                        players_by_id = {p["id"]: p for p in state["players"]}
-                        alive_bots = [bid for bid in bot_ids if bid in players_by_id and players_by_id[bid]["isAlive"]]
-                    except Exception as e:
-                        print(f"Re-registration failed: {e}")
-                        continue
-
-            # Build alive mask for this tick
-            alive_mask = np.array(
-                [
-                    1.0 if bid in players_by_id and players_by_id[bid]["isAlive"] else 0.0
-                    for bid in bot_ids
-                ],
-                dtype=np.float32,
-            )
+            if len(dead_slots) > 0:
+                try:
+                    print(f"Re-registering {len(dead_slots)} dead bots (killed in game)...")
+                    new_ids = client.register_bots(len(dead_slots))
+                    print(f"Re-registered: {new_ids}")
+                    # Slots beyond the returned ids keep their bot and are retried next tick
+                    replaced = dead_slots[:len(new_ids)]
+                    died[replaced] = True
+                    death_rewards[replaced] = -registry.prev_mass[replaced] / start_mass
+                    registry.replace(replaced, new_ids)
+                    league.record_deaths(replaced)
+                    # Refresh state for the new bots
+                    state = client.get_state()
+                    registry.refresh(state)
+                except Exception as e:
+                    print(f"Re-registration failed: {e}")
+                    continue
 
-            # Build observations (include previous actions for recurrence)
-            raw_obs = build_observations(state, bot_ids, prev_actions)
-            # Only update normalizer with alive bot observations
-            if alive_mask.sum() > 0:
-                obs_normalizer.update(raw_obs[alive_mask > 0])
-            obs = obs_normalizer.normalize(raw_obs)
+            alive_mask = registry.alive.astype(np.float32)
 
             # Compute rewards from mass deltas
-            rewards, prev_masses = compute_rewards(None, state, bot_ids, prev_masses, start_mass)
-            reward_normalizer.update(rewards)
-            norm_rewards = reward_normalizer.normalize(rewards)
-
-            # Determine which bots are done (dead)
-            dones = np.array(
-                [
-                    0.0 if bid in players_by_id and players_by_id[bid]["isAlive"] else 1.0
-                    for bid in bot_ids
-                ],
-                dtype=np.float32,
+            rewards, registry.prev_mass = compute_rewards(
+                registry.mass, registry.prev_mass, registry.alive, start_mass
             )
 
-            # Get actions from model
-            obs_t = torch.from_numpy(obs).to(config.DEVICE)
-            with torch.no_grad():
-                actions, log_probs, values = model.get_action(obs_t)
+            # Determine which bots are done: dead now, or died and were replaced this tick
+            dones = 1.0 - alive_mask
+            rewards[died] = death_rewards[died]
+            dones[died] = 1.0
+            registry.reward_sum += rewards
+
+            # Bots act every DECISION_INTERVAL ticks (new bots right away) and keep
+            # moving toward their last target in between
+            due = registry.due(loop_tick, config.DECISION_INTERVAL, config.STAGGER_DECISIONS) | died
+            loop_tick += 1
+            rows = np.flatnonzero(due & registry.alive)
+            row_groups = league.groups[rows]
+            learner_rows = rows[row_groups == 0]
+
+            # Build observations (include previous actions for recurrence)
+            raw_obs = build_observations(
+                state,
+                [registry.ids[i] for i in rows],
+                registry.prev_actions[rows],
+                [registry.players[i] for i in rows],
+            )
+            # Only deciding bots are observed; all of them are alive
+            if len(rows) > 0:
+                obs_normalizer.update(raw_obs)
+            obs = obs_normalizer.normalize(raw_obs)
+
+            # Get actions: learner rows from the live model, frozen groups from their snapshots
+            actions_np = np.zeros((len(rows), config.ACTION_SIZE), dtype=np.float32)
+            log_probs_np = np.zeros(0, dtype=np.float32)
+            values_np = np.zeros(0, dtype=np.float32)
+            if len(rows) > 0:
+                with metrics.INFERENCE_SECONDS.time():
+                    is_learner = row_groups == 0
+                    obs_t = torch.from_numpy(obs[is_learner]).to(config.DEVICE)
+                    with torch.no_grad():
+                        actions, log_probs, values = model.get_action(obs_t)
 
-            actions_np = actions.cpu().numpy()
-            log_probs_np = log_probs.cpu().numpy()
-            values_np = values.cpu().numpy()
-            prev_actions = actions_np.copy()
+                    actions_np[is_learner] = actions.cpu().numpy()
+                    log_probs_np = log_probs.cpu().numpy()
+                    values_np = values.cpu().numpy()
+                    league.act(raw_obs, actions_np, row_groups)
+                registry.prev_actions[rows] = actions_np
 
             # Send actions to game (relative offset scaled by 200, clamped to map)
-            map_size = game_config["mapSize"]
-            action_list = []
-            for i, bid in enumerate(bot_ids):
-                if bid not in players_by_id or not players_by_id[bid]["isAlive"]:
-                    continue
-                p = players_by_id[bid]
-                target_x = max(0.0, min(float(map_size), p["x"] + float(actions_np[i, 0]) * 200))
-                target_y = max(0.0, min(float(map_size), p["y"] + float(actions_np[i, 1]) * 200))
-                action_list.append({
-                    "playerId": bid,
-                    "targetX": target_x,
-                    "targetY": target_y,
+            target_x, target_y = registry.action_targets(
+                registry.prev_actions, float(game_config["mapSize"])
+            )
+            action_list = [
+                {
+                    "playerId": registry.ids[i],
+                    "targetX": float(target_x[i]),
+                    "targetY": float(target_y[i]),
                     "split": False,
-                })
+                }
+                for i in rows
+            ]
 
             if action_list:
                 client.post_actions(action_list)
+                if first_action_pending:
+                    first_action_pending = False
+                    time_to_first_action = time.perf_counter() - _START_TIME
+                    metrics.STARTUP_SECONDS.set(time_to_first_action)
+                    print(f"Time to first action: {time_to_first_action:.2f}s")
 
-            # Store transitions and train (skip when inference-only or all dead)
+            # Store transitions and train (skip when inference-only)
             alive_count_now = int(alive_mask.sum())
-            if training_enabled and alive_count_now > 0:
-                # Mask dead bots: zero out their data so they don't pollute training
-                masked_obs = obs.copy()
-                masked_actions = actions_np.copy()
-                masked_log_probs = log_probs_np.copy()
-                masked_rewards = norm_rewards.copy()
-                masked_values = values_np.copy()
-                dead_mask = alive_mask < 1.0
-                masked_obs[dead_mask] = 0.0
-                masked_actions[dead_mask] = 0.0
-                masked_log_probs[dead_mask] = 0.0
-                masked_rewards[dead_mask] = 0.0
-                masked_values[dead_mask] = 0.0
-
-                buffer.add(masked_obs, masked_actions, masked_log_probs, masked_rewards, masked_values, dones)
-                total_steps += alive_count_now
-
-                # Train if buffer full
+            metrics.ALIVE_BOTS.set(alive_count_now)
+            if league.snapshots:
+                league.record(registry.mass, alive_mask)
+            # Rewards summed since each bot's last decision close its transition
+            # when it decides again or its episode ends
+            closing = due | (dones > 0)
+            if training_enabled:
+                closing_learner = closing[learner]
+                learner_rewards = registry.reward_sum[learner]
+                has_pending = (buffer.pending >= 0) & closing_learner
+                if has_pending.any():
+                    reward_normalizer.update(learner_rewards[has_pending])
+                buffer.complete(
+                    reward_normalizer.normalize(learner_rewards), dones[learner], closing_learner
+                )
+
+                # Store only bots that decided this tick
+                is_learner = row_groups == 0
+                buffer.add(
+                    league.learner_index[learner_rows],
+                    obs[is_learner],
+                    actions_np[is_learner],
+                    log_probs_np,
+                    values_np,
+                )
+                total_steps += len(learner_rows)
+                metrics.STEPS.inc(len(learner_rows))
+                metrics.BUFFER_FILL.set(buffer.fill_ratio())
+
+                # Train once enough completed transitions are collected
                 if buffer.ready():
-                    # Compute bootstrap values V(s_T) for GAE
-                    with torch.no_grad():
-                        _, bootstrap_values = model.forward(obs_t)
-                        last_values = bootstrap_values.squeeze(-1).cpu().numpy()
-                    # Zero bootstrap for dead bots
-                    last_values[dead_mask] = 0.0
-
-                    stats = ppo_update(model, optimizer, buffer, last_values)
+                    if optimizer_pending:
+                        load_optimizer_state(model, optimizer)
+                        optimizer_pending = False
+
+                    valid_samples = buffer.valid_count
+                    dense_samples = buffer.ticks * buffer.num_bots // config.DECISION_INTERVAL
+                    update_start = time.time()
+                    torch.set_num_threads(train_threads)
+                    try:
+                        stats = ppo_update(
+                            model, optimizer, buffer,
+                            epochs=schedule.epochs, minibatch_size=schedule.minibatch_size,
+                        )
+                    finally:
+                        torch.set_num_threads(inference_threads)
+                    update_time = time.time() - update_start
+                    if config.ADAPTIVE_SCHEDULE:
+                        schedule.step(stats, update_time)
+                    metrics.PPO_UPDATE_SECONDS.observe(update_time)
+                    metrics.PPO_UPDATES.inc()
+                    metrics.BUFFER_FILL.set(0.0)
                     train_count += 1
-                    avg_reward = rewards.mean()
+                    avg_reward = rewards[learner].mean()
                     alive_count = int((1 - dones).sum())
+                    early_stop = ""
+                    if stats["early_stopped"]:
+                        early_stop = f" (early stop at kl={stats['stop_kl']:.4f})"
                     print(
                         f"[Train {train_count}] step={total_steps} "
                         f"loss={stats['loss']:.4f} policy={stats['policy_loss']:.4f} "
                         f"value={stats['value_loss']:.4f} entropy={stats['entropy']:.4f} "
-                        f"reward={avg_reward:.4f} alive={alive_count}/{len(bot_ids)}"
+                        f"kl={stats['approx_kl']:.4f} clip={stats['clip_fraction']:.3f} "
+                        f"epochs={stats['epochs']:.2f}{early_stop} "
+                        f"reward={avg_reward:.4f} alive={alive_count}/{num_bots} "
+                        f"samples={valid_samples}/{dense_samples} update={update_time:.1f}s"
                     )
 
                     # Report stats to server
@@ -267,14 +327,24 @@ def main():
                             "policyLoss": float(stats['policy_loss']),
                             "valueLoss": float(stats['value_loss']),
                             "entropy": float(stats['entropy']),
+                            "approxKl": float(stats['approx_kl']),
+                            "clipFraction": float(stats['clip_fraction']),
+                            "epochs": float(stats['epochs']),
+                            "updateSeconds": float(update_time),
                         })
                     except Exception:
                         pass
 
+            registry.reward_sum[closing] = 0.0
+
             # Save periodically
             if time.time() - last_save > config.SAVE_INTERVAL:
                 save_model(model, optimizer, obs_normalizer, reward_normalizer, total_steps)
+                client.flush_capture()
                 last_save = time.time()
+                if league.snapshots:
+                    for line in league.report():
+                        print(line)
 
         except KeyboardInterrupt:
             break
@@ -285,6 +355,7 @@ def main():
 
         # Throttle to match game tick rate
         elapsed = time.time() - loop_start
+        metrics.TICK_SECONDS.observe(elapsed)
         if elapsed < config.TICK_INTERVAL:
             time.sleep(config.TICK_INTERVAL - elapsed)
 
@@ -296,11 +367,80 @@ def main():
         client.remove_bots()
     except Exception:
         pass
+    client.close()
     print("Done.")
 
 
+def load_checkpoint(
+    model, obs_normalizer, reward_normalizer, path: str | None = None
+) -> tuple[int, bool]:
+    """Restore model weights and normalizers, preferring the memory-mapped weights file.
+
+    Returns (total_steps, optimizer_pending) where optimizer_pending means the
+    full checkpoint holds optimizer state still to be loaded.
+    """
+    if path is not None:
+        weights_only = False
+    elif os.path.exists(config.WEIGHTS_PATH):
+        path, weights_only = config.WEIGHTS_PATH, True
+    elif os.path.exists(config.MODEL_PATH):
+        # Checkpoints from before the weights file existed may hold numpy scalars
+        path, weights_only = config.MODEL_PATH, False
+    else:
+        print("Starting with fresh model")
+        return 0, False
+
+    try:
+        checkpoint = torch.load(
+            path, map_location=config.DEVICE, mmap=True, weights_only=weights_only
+        )
+        model.load_state_dict(checkpoint["model"])
+        if "obs_normalizer" in checkpoint:
+            obs_normalizer.load_state_dict(checkpoint["obs_normalizer"])
+        if "reward_normalizer" in checkpoint:
+            reward_normalizer.load_state_dict(checkpoint["reward_normalizer"])
+        total_steps = checkpoint.get("total_steps", 0)
+        print(f"Loaded model from {path} (step {total_steps})")
+        return total_steps, os.path.exists(config.MODEL_PATH)
+    except Exception as e:
+        print(f"WARNING: Failed to load checkpoint: {e}")
+        print(f"Delete {path} if architecture changed. Starting fresh.")
+        return 0, False
+
+
+def load_optimizer_state(model, optimizer):
+    """Restore optimizer state from the full checkpoint; deferred until the first PPO update.
+
+    Skipped when the checkpoint belongs to a different architecture (e.g. a
+    distilled student deployed next to its teacher's ppo_model.pt).
+    """
+    try:
+        checkpoint = torch.load(
+            config.MODEL_PATH, map_location=config.DEVICE, mmap=True, weights_only=False
+        )
+        saved_shapes = {k: v.shape for k, v in checkpoint["model"].items()}
+        model_shapes = {k: v.shape for k, v in model.state_dict().items()}
+        if saved_shapes != model_shapes:
+            print(f"WARNING: {config.MODEL_PATH} does not match the network architecture. "
+                  f"Using fresh optimizer.")
+            return
+        optimizer.load_state_dict(checkpoint["optimizer"])
+        print(f"Loaded optimizer state from {config.MODEL_PATH}")
+    except Exception as e:
+        print(f"WARNING: Failed to load optimizer state: {e}. Using fresh optimizer.")
+
+
+def _save_atomic(obj: dict, path: str):
+    """Write to a temp file and rename it into place, so a crash never leaves a truncated checkpoint."""
+    tmp_path = f"{path}.tmp"
+    torch.save(obj, tmp_path)
+    os.replace(tmp_path, path)
+
+
 def save_model(model, optimizer, obs_normalizer, reward_normalizer, total_steps):
-    torch.save(
+    save_start = time.time()
+    # The weights file goes last: startup prefers it, so it never gets ahead of the optimizer state
+    _save_atomic(
         {
             "model": model.state_dict(),
             "optimizer": optimizer.state_dict(),
@@ -310,6 +450,17 @@ def save_model(model, optimizer, obs_normalizer, reward_normalizer, total_steps)
         },
         config.MODEL_PATH,
     )
+    _save_atomic(
+        {
+            "model": model.state_dict(),
+            "obs_normalizer": obs_normalizer.state_dict(),
+            "reward_normalizer": reward_normalizer.state_dict(),
+            "total_steps": total_steps,
+            "hidden_sizes": config.HIDDEN_SIZES,
+        },
+        config.WEIGHTS_PATH,
+    )
+    metrics.CHECKPOINT_SECONDS.observe(time.time() - save_start)
     print(f"Model saved to {config.MODEL_PATH} (step {total_steps})")
 
 
@@ -46,7 +46,11 @@ public record TrainingStats(
     double AvgReward,
     double PolicyLoss,
     double ValueLoss,
-    double Entropy);
+    double Entropy,
+    double ApproxKl,
+    double ClipFraction,
+    double Epochs,
+    double UpdateSeconds);
 
 public record GameConfigSnapshot(
     int MapSize,
@@ -74,7 +74,11 @@ public class AiApiController : ControllerBase
             request.AvgReward,
             request.PolicyLoss,
             request.ValueLoss,
-            request.Entropy));
+            request.Entropy,
+            request.ApproxKl,
+            request.ClipFraction,
+            request.Epochs,
+            request.UpdateSeconds));
         return Ok();
     }
 }
@@ -87,7 +91,11 @@ public record TrainingStatsRequest(
     double AvgReward,
     double PolicyLoss,
     double ValueLoss,
-    double Entropy);
+    double Entropy,
+    double ApproxKl,
+    double ClipFraction,
+    double Epochs,
+    double UpdateSeconds);
 
 public record RegisterPlayersRequest(int Count);
 
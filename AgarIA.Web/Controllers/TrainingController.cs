@@ -31,7 +31,11 @@ public class TrainingController : AdminBaseController
                 AvgReward = stats.AvgReward,
                 PolicyLoss = stats.PolicyLoss,
                 ValueLoss = stats.ValueLoss,
-                Entropy = stats.Entropy
+                Entropy = stats.Entropy,
+                ApproxKl = stats.ApproxKl,
+                ClipFraction = stats.ClipFraction,
+                Epochs = stats.Epochs,
+                UpdateSeconds = stats.UpdateSeconds
             }
         });
     }
@@ -5,7 +5,9 @@ using AgarIA.Core.Repositories;
 using AgarIA.Web.Data;
 using AgarIA.Web.Services;
 using AgarIA.Web.Services.FlashMessage;
+using System.IO.Compression;
 using Microsoft.AspNetCore.Identity;
+using Microsoft.AspNetCore.ResponseCompression;
 using Microsoft.EntityFrameworkCore;
 
 var builder = WebApplication.CreateBuilder(args);
@@ -58,6 +60,19 @@ builder.Services.AddFlashMessage();
 builder.Services.AddControllersWithViews()
     .AddRazorRuntimeCompilation();
 
+// AI API payload compression: gzip/brotli responses and Content-Encoding request bodies
+var aiApiCompression = builder.Configuration.GetValue("AiApi:Compression", true);
+if (aiApiCompression) {
+    builder.Services.AddResponseCompression(options => {
+        options.EnableForHttps = true;
+        options.Providers.Add<BrotliCompressionProvider>();
+        options.Providers.Add<GzipCompressionProvider>();
+    });
+    builder.Services.Configure<BrotliCompressionProviderOptions>(options => options.Level = CompressionLevel.Fastest);
+    builder.Services.Configure<GzipCompressionProviderOptions>(options => options.Level = CompressionLevel.Fastest);
+    builder.Services.AddRequestDecompression();
+}
+
 // Game settings singleton
 builder.Services.AddSingleton<GameSettings>();
 
@@ -83,6 +98,13 @@ using (var scope = app.Services.CreateScope()) {
     await AdminSettingsService.Load(db, gameSettings);
 }
 
+if (aiApiCompression) {
+    app.UseWhen(context => context.Request.Path.StartsWithSegments("/api/ai"), ai => {
+        ai.UseRequestDecompression();
+        ai.UseResponseCompression();
+    });
+}
+
 app.UseStaticFiles();
 app.UseRouting();
 app.UseAuthentication();